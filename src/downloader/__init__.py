@@ -30,6 +30,7 @@ from gi.repository import GLib
 from video_downloader.util import g_log
 
 MAX_RESOLUTION = 2**16
+METADATA_CACHE_MAX_ENTRY_SIZE = 2 * 1024**2  # bytes of info JSON
 
 
 class Downloader:
@@ -142,6 +143,14 @@ class Handler:
     def get_resolution(self) -> int:
         raise NotImplementedError
 
+    def get_cached_metadata(self, url: str, variant: list
+                            ) -> typing.Optional[typing.List[dict]]:
+        raise NotImplementedError
+
+    def on_metadata_loaded(self, url: str, variant: list,
+                           infos: typing.List[dict], size: int):
+        raise NotImplementedError
+
     def on_playlist_request(self) -> bool:
         raise NotImplementedError
 
@@ -32,7 +32,8 @@ import traceback
 import youtube_dl
 from youtube_dl.utils import dfxp2srt, sanitize_filename
 
-from video_downloader.downloader import MAX_RESOLUTION
+from video_downloader.downloader import (
+    MAX_RESOLUTION, METADATA_CACHE_MAX_ENTRY_SIZE)
 from video_downloader.downloader.youtube_dl_formats import sort_formats
 
 MAX_OUTPUT_TITLE_LENGTH = 150  # File names are typically limited to 255 bytes
@@ -98,10 +99,17 @@ class YoutubeDLSlave:
          [(subtitle, lang, ext), ...]), ...], skipped videos)
         """
         os.chdir(dir_)
+        # The result depends on these options
+        cache_variant = [bool(self.ydl_opts.get('noplaylist')),
+                         self.ydl_opts.get('playlistend')]
+        cached_infos = self._handler.get_cached_metadata(url, cache_variant)
         while True:
             try:
                 saved_skipped_count = self._skipped_count
-                youtube_dl.YoutubeDL(self.ydl_opts).download([url])
+                if cached_infos is None:
+                    youtube_dl.YoutubeDL(self.ydl_opts).download([url])
+                else:
+                    self._load_cached_playlist(cached_infos)
             except RetryException:
                 continue
             break
@@ -127,8 +135,37 @@ class YoutubeDLSlave:
                                           sub_lang, sub_ext))
             results.append((os.path.abspath(name), thumbnails, subtitles))
         results.sort(key=lambda result: result[0])
+        # Credentials and cookies are not available in other runs
+        if (cached_infos is None and
+                self._skipped_count == saved_skipped_count and
+                not any(k in self.ydl_opts for k in [
+                    'username', 'password', 'videopassword'])):
+            size = sum(os.path.getsize(info_path)
+                       for info_path, _, _ in results)
+            if size <= METADATA_CACHE_MAX_ENTRY_SIZE:
+                infos = []
+                for info_path, _, _ in results:
+                    with open(info_path) as f:
+                        infos.append(json.load(f))
+                self._handler.on_metadata_loaded(url, cache_variant, infos,
+                                                 size)
         return (results, self._skipped_count - saved_skipped_count)
 
+    def _load_cached_playlist(self, infos):
+        """Generate the files of `_load_playlist` from cached info dicts.
+
+        Skips the extractors, only thumbnails and subtitles are downloaded.
+        """
+        cached_dir = os.path.abspath('cached')
+        os.makedirs(cached_dir, exist_ok=True)
+        # Use the same instance for all videos to increment `autonumber`
+        ydl = youtube_dl.YoutubeDL(self.ydl_opts)
+        for i, info in enumerate(infos):
+            info_path = os.path.join(cached_dir, '%d.json' % i)
+            with open(info_path, 'w') as f:
+                json.dump(info, f)
+            ydl.download_with_info_file(info_path)
+
     def _load_video(self, dir_, info_path):
         os.chdir(dir_)
         while True:
@@ -0,0 +1,170 @@
+# Copyright (C) 2019 Unrud <unrud@outlook.com>
+#
+# This file is part of Video Downloader.
+#
+# Video Downloader is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Video Downloader is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Video Downloader.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import concurrent.futures
+import json
+import os
+import sqlite3
+import time
+import traceback
+
+from gi.repository import GLib
+
+from video_downloader.util import g_log
+
+
+class MetadataCache:
+    """LRU cache for info dicts of URLs, persisted in a SQLite database.
+
+    Recently used entries are kept in memory. The database is opened and
+    written on a worker thread. Lookups that miss the memory read it on the
+    main thread, which is bounded by `max_entry_size`.
+    """
+
+    def __init__(self, path, size, max_entry_size, ttl, db_size):
+        self._size = size
+        self._max_entry_size = max_entry_size
+        self._ttl = ttl
+        self._db_size = db_size
+        # (url, variant) -> (timestamp, size, [info dict, ...])
+        self._memory = collections.OrderedDict()
+        self._memory_size = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # Set by the worker thread, the database is unused until then
+        self._read_db = self._write_db = None
+        self._submit(self._open_db, path)
+
+    @staticmethod
+    def _connect(path):
+        db = sqlite3.connect(path, isolation_level=None,
+                             check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def _submit(self, func, *args):
+        def wrap_func():
+            try:
+                func(*args)
+            except (OSError, sqlite3.Error):
+                g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                      traceback.format_exc())
+        self._executor.submit(wrap_func)
+
+    def _open_db(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_db = self._connect(path)
+        write_db.execute(
+            'CREATE TABLE IF NOT EXISTS meta(url TEXT, variant TEXT, '
+            'info TEXT, ts INTEGER, PRIMARY KEY (url, variant))')
+        self._write_db = write_db
+        self._delete_expired()
+        self._read_db = self._connect(path)
+
+    def _close_write_db(self):
+        if self._write_db:
+            self._write_db.close()
+            self._write_db = None
+
+    def _write(self, sql, parameters=()):
+        if self._write_db:
+            self._write_db.execute(sql, parameters)
+
+    def _insert(self, key, infos, timestamp):
+        if not self._write_db:
+            return
+        self._write_db.execute(
+            'INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?)',
+            (*key, json.dumps(infos), timestamp))
+        self._delete_expired()
+
+    def _delete_expired(self):
+        self._write_db.execute('DELETE FROM meta WHERE ts <= ?',
+                               (time.time() - self._ttl,))
+        self._write_db.execute(
+            'DELETE FROM meta WHERE rowid NOT IN ('
+            'SELECT rowid FROM meta ORDER BY ts DESC LIMIT ?)',
+            (self._db_size,))
+
+    def get(self, url, variant):
+        key = (url, json.dumps(variant))
+        min_timestamp = time.time() - self._ttl
+        try:
+            timestamp, _, infos = self._memory[key]
+        except KeyError:
+            timestamp, size, infos = self._get_from_db(key, min_timestamp)
+            if infos is None:
+                return None
+            self._add_to_memory(key, timestamp, size, infos)
+        if timestamp < min_timestamp:
+            self._remove_from_memory(key)
+            return None
+        self._memory.move_to_end(key)
+        return infos
+
+    def _get_from_db(self, key, min_timestamp):
+        if not self._read_db:
+            return None, None, None
+        try:
+            row = self._read_db.execute(
+                'SELECT ts, info FROM meta WHERE url=? AND variant=? AND '
+                'ts > ? AND length(info) <= ?',
+                (*key, min_timestamp, self._max_entry_size)).fetchone()
+        except sqlite3.Error:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                  traceback.format_exc())
+            return None, None, None
+        if row is None:
+            return None, None, None
+        timestamp, info_json = row
+        return timestamp, len(info_json), json.loads(info_json)
+
+    def put(self, url, variant, infos, size):
+        """`size` is the approximate size of `infos` in bytes"""
+        if size > min(self._size, self._max_entry_size):
+            return
+        key = (url, json.dumps(variant))
+        timestamp = int(time.time())
+        self._add_to_memory(key, timestamp, size, infos)
+        self._submit(self._insert, key, infos, timestamp)
+
+    def invalidate(self, url):
+        for key in [k for k in self._memory if k[0] == url]:
+            self._remove_from_memory(key)
+        self._submit(self._write, 'DELETE FROM meta WHERE url=?', (url,))
+
+    def _add_to_memory(self, key, timestamp, size, infos):
+        if key in self._memory:
+            self._remove_from_memory(key)
+        self._memory[key] = (timestamp, size, infos)
+        self._memory_size += size
+        while self._memory_size > self._size:
+            _, (_, size, _) = self._memory.popitem(last=False)
+            self._memory_size -= size
+
+    def _remove_from_memory(self, key):
+        _, size, _ = self._memory.pop(key)
+        self._memory_size -= size
+
+    def close(self):
+        """Wait for pending writes and close the database"""
+        self._submit(self._close_write_db)
+        self._executor.shutdown()
+        if self._read_db:
+            self._read_db.close()
+            self._read_db = None
@@ -17,18 +17,31 @@
 
 import gettext
 import os
-import subprocess
 import traceback
 import typing
 
 from gi.repository import GLib, GObject, Gio
 
 from video_downloader import downloader
-from video_downloader.downloader import MAX_RESOLUTION
+from video_downloader.downloader import (
+    MAX_RESOLUTION, METADATA_CACHE_MAX_ENTRY_SIZE)
+from video_downloader.metadata_cache import MetadataCache
 from video_downloader.util import bind_property, g_log, expand_path
 
+METADATA_CACHE_SIZE = 16 * 1024**2  # bytes of info JSON
+METADATA_CACHE_TTL = 10 * 60  # seconds
+METADATA_CACHE_DB_SIZE = 3000
+LOAD_PROGRESS_INTERVAL = 100  # milliseconds
+FILEMANAGER_CALL_TIMEOUT = 5000  # milliseconds
+FILEMANAGER_MAX_SHOW_ITEMS = 32
+LOAD_PROGRESS_PROPERTIES = (
+    'download-filename', 'download-progress', 'download-bytes',
+    'download-bytes-total', 'download-eta', 'download-speed')
 N_ = gettext.gettext
 
+_ACTIVE_STATES = frozenset(('download', 'cancel'))
+_TERMINAL_STATES = frozenset(('success', 'error'))
+
 
 class Model(GObject.GObject, downloader.Handler):
     __gsignals__ = {
@@ -66,18 +79,35 @@ class Model(GObject.GObject, downloader.Handler):
         (360, N_('360p')),
         (240, N_('240p')),
         (144, N_('144p'))]
+    _download_defaults = {
+        'error': '',
+        'download-playlist-index': 0,
+        'download-playlist-count': 0,
+        'download-filename': '',
+        'download-title': '',
+        'download-thumbnail': '',
+        'download-progress': -1,
+        'download-bytes': -1,
+        'download-bytes-total': -1,
+        'download-speed': -1,
+        'download-eta': -1}
 
     def __init__(self, handler=None):
         super().__init__()
         self._handler = handler
         self._downloader = downloader.Downloader(self)
         self._download_finished_filenames = []
-        self._filemanager_proxy = Gio.DBusProxy.new_for_bus_sync(
-            Gio.BusType.SESSION, Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES |
-            Gio.DBusProxyFlags.DO_NOT_CONNECT_SIGNALS |
-            Gio.DBusProxyFlags.DO_NOT_AUTO_START_AT_CONSTRUCTION, None,
-            'org.freedesktop.FileManager1', '/org/freedesktop/FileManager1',
-            'org.freedesktop.FileManager1')
+        self._metadata_cache = MetadataCache(
+            os.path.join(GLib.get_user_cache_dir(), 'video-downloader',
+                         'metadata.db'),
+            METADATA_CACHE_SIZE, METADATA_CACHE_MAX_ENTRY_SIZE,
+            METADATA_CACHE_TTL, METADATA_CACHE_DB_SIZE)
+        # Load progress is coalesced to limit updates of the UI
+        self._pending_load_progress = None
+        self._last_load_progress = None
+        self._load_progress_source_id = 0
+        # Created on first use
+        self._filemanager_proxy = None
         bind_property(self, 'download-dir', self, 'download-dir-abs',
                       expand_path)
         self.actions = Gio.SimpleActionGroup.new()
@@ -86,128 +116,186 @@ class Model(GObject.GObject, downloader.Handler):
             ('cancel', lambda *_: self.set_property('state', 'cancel')),
             ('back', lambda *_: self.set_property('state', 'start')),
             ('open-download-dir', self._open_download_dir)])
-        bind_property(self, 'url', self.actions.lookup_action('download'),
-                      'enabled', bool)
+        self.connect('notify::url', lambda *_: self._update_download_action())
         bind_property(self, 'state', self,
                       'prev-state', self._state_transition)
-        bind_property(self, 'state', self.actions.lookup_action('cancel'),
-                      'enabled', lambda s: s == 'download')
+
+    def _update_download_action(self):
+        # The download action is only available on the start screen
+        self.actions.lookup_action('download').set_enabled(
+            self.state == 'start' and bool(self.url))
 
     def _state_transition(self, state):
         if state == 'start':
             assert self.prev_state != 'download'
         elif state == 'download':
             assert self.prev_state == 'start'
-            self.error = ''
-            self.download_playlist_index = 0
-            self.download_playlist_count = 0
-            self.download_filename = ''
-            self.download_title = ''
-            self.download_thumbnail = ''
-            self.download_progress = -1
-            self.download_bytes = -1
-            self.download_bytes_total = -1
-            self.download_speed = -1
-            self.download_eta = -1
+            for name, value in self._download_defaults.items():
+                # Skip notifications for unchanged values
+                if self.get_property(name) != value:
+                    self.set_property(name, value)
             self._download_finished_filenames.clear()
             self._downloader.start()
         elif state == 'cancel':
             assert self.prev_state == 'download'
             self._downloader.cancel()
-        elif state in ['success', 'error']:
+        elif state in _TERMINAL_STATES:
             assert self.prev_state == 'download'
         else:
             assert False
+        self._update_download_action()
+        self.actions.lookup_action('cancel').set_enabled(state == 'download')
         return state
 
     def _open_download_dir(self, action, parameter, user_data):
-        if len(self._download_finished_filenames) == 1:
+        dir_uri = GLib.filename_to_uri(self.download_dir_abs, None)
+        if 1 <= len(self._download_finished_filenames) <= (
+                FILEMANAGER_MAX_SHOW_ITEMS):
             method = 'ShowItems'
-            paths = [os.path.join(self.download_dir_abs, filename) for
-                     filename in self._download_finished_filenames]
+            if not dir_uri.endswith('/'):
+                dir_uri += '/'
+            uris = [dir_uri + GLib.uri_escape_string(filename, None, False)
+                    for filename in self._download_finished_filenames]
         else:
             method = 'ShowFolders'
-            paths = [self.download_dir_abs]
-        parameters = GLib.Variant(
-            '(ass)', ([Gio.File.new_for_path(p).get_uri() for p in paths], ''))
+            uris = [dir_uri]
+        parameters = GLib.Variant('(ass)', (uris, ''))
+        if self._filemanager_proxy:
+            self._call_filemanager(method, parameters)
+            return
+        Gio.DBusProxy.new_for_bus(
+            Gio.BusType.SESSION, Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES |
+            Gio.DBusProxyFlags.DO_NOT_CONNECT_SIGNALS |
+            Gio.DBusProxyFlags.DO_NOT_AUTO_START_AT_CONSTRUCTION, None,
+            'org.freedesktop.FileManager1', '/org/freedesktop/FileManager1',
+            'org.freedesktop.FileManager1', None,
+            self._on_filemanager_proxy_ready, (method, parameters))
+
+    def _on_filemanager_proxy_ready(self, source_object, result, user_data):
+        method, parameters = user_data
         try:
-            self._filemanager_proxy.call_sync(
-                method, parameters, Gio.DBusCallFlags.NONE, -1)
+            self._filemanager_proxy = Gio.DBusProxy.new_for_bus_finish(result)
         except GLib.Error:
-            g_log('youtube-dl', GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+            self._open_download_dir_fallback()
+            return
+        self._call_filemanager(method, parameters)
+
+    def _call_filemanager(self, method, parameters):
+        self._filemanager_proxy.call(
+            method, parameters, Gio.DBusCallFlags.NONE,
+            FILEMANAGER_CALL_TIMEOUT, None, self._on_filemanager_call_done)
+
+    def _on_filemanager_call_done(self, proxy, result):
+        try:
+            proxy.call_finish(result)
+        except GLib.Error:
+            self._open_download_dir_fallback()
+
+    def _open_download_dir_fallback(self):
+        g_log('youtube-dl', GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+              traceback.format_exc())
+        try:
+            Gio.AppInfo.launch_default_for_uri(
+                GLib.filename_to_uri(self.download_dir_abs, None), None)
+        except GLib.Error:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
                   traceback.format_exc())
-            subprocess.run(['xdg-open', self.download_dir_abs], check=True)
 
     def shutdown(self):
         self._downloader.shutdown()
+        self._metadata_cache.close()
 
     def on_pulse(self):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         self.emit('download-pulse')
 
     def on_finished(self, success):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
+        if self._load_progress_source_id:
+            GLib.source_remove(self._load_progress_source_id)
+            self._load_progress_source_id = 0
+        self._pending_load_progress = self._last_load_progress = None
         if self.state == 'cancel':
             self.state = 'start'
         else:
             self.state = 'success' if success else 'error'
 
     def get_download_dir(self):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         return self.download_dir_abs
 
     def get_prefer_mpeg(self):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         return self.prefer_mpeg
 
     def get_url(self):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         return self.url
 
     def get_mode(self):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         return self.mode
 
     def get_resolution(self):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         return self.resolution
 
+    def get_cached_metadata(self, url, variant):
+        assert self.state in _ACTIVE_STATES
+        return self._metadata_cache.get(url, variant)
+
+    def on_metadata_loaded(self, url, variant, infos, size):
+        assert self.state in _ACTIVE_STATES
+        self._metadata_cache.put(url, variant, infos, size)
+
     def on_playlist_request(self):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         return self._handler.on_playlist_request()
 
     def on_login_request(self):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         return self._handler.on_login_request()
 
     def on_videopassword_request(self):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         return self._handler.on_videopassword_request()
 
     def on_error(self, msg):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         self.error = msg
+        self._metadata_cache.invalidate(self.url)
 
     def on_load_progress(self, filename, progress, bytes_, bytes_total, eta,
                          speed):
-        assert self.state in ['download', 'cancel']
-        self.download_filename = filename
-        self.download_progress = progress
-        self.download_bytes = bytes_
-        self.download_bytes_total = bytes_total
-        self.download_eta = eta
-        self.download_speed = speed
+        assert self.state in _ACTIVE_STATES
+        self._pending_load_progress = (filename, progress, bytes_,
+                                       bytes_total, eta, speed)
+        if not self._load_progress_source_id:
+            self._load_progress_source_id = GLib.timeout_add(
+                LOAD_PROGRESS_INTERVAL, self._flush_load_progress)
+
+    def _flush_load_progress(self):
+        last = self._last_load_progress or (None,) * len(
+            LOAD_PROGRESS_PROPERTIES)
+        for name, value, last_value in zip(LOAD_PROGRESS_PROPERTIES,
+                                           self._pending_load_progress, last):
+            if value != last_value:
+                self.set_property(name, value)
+        self._last_load_progress = self._pending_load_progress
+        self._pending_load_progress = None
+        self._load_progress_source_id = 0
+        return GLib.SOURCE_REMOVE
 
     def on_progress_start(self, playlist_index, playlist_count, title,
                           thumbnail):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         self.download_playlist_index = playlist_index
         self.download_playlist_count = playlist_count
         self.download_title = title
         self.download_thumbnail = thumbnail
 
     def on_progress_end(self, filename):
-        assert self.state in ['download', 'cancel']
+        assert self.state in _ACTIVE_STATES
         self._download_finished_filenames.append(filename)
 
 